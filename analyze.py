@@ -4,9 +4,15 @@ Swarm Wrapped - Analysis Module
 Processes raw Foursquare check-in data and generates statistics for the wrapped report.
 """
 
-from collections import Counter, defaultdict
-from datetime import datetime, timedelta
+from collections import Counter, defaultdict, namedtuple
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 import math
+import re
+import sys
+from typing import Iterable
+
+import orjson
 
 # Personality types based on check-in patterns
 PERSONALITY_TYPES = {
@@ -82,6 +88,16 @@ PERSONALITY_TYPES = {
     }
 }
 
+# Lowercased category keywords per personality type, computed once at import
+PERSONALITY_KEYWORDS = {
+    type_id: [keyword.lower() for keyword in type_info["categories"]]
+    for type_id, type_info in PERSONALITY_TYPES.items()
+    if "categories" in type_info
+}
+
+# One bit per category-based personality type, used to tag category names
+PERSONALITY_CATEGORY_BITS = {type_id: 1 << i for i, type_id in enumerate(PERSONALITY_KEYWORDS)}
+
 
 # Categories to exclude when privacy filters are enabled
 FILTER_CATEGORIES = {
@@ -108,6 +124,17 @@ FILTER_CATEGORIES = {
 # Legacy support - combined list for backward compatibility
 SENSITIVE_CATEGORIES = FILTER_CATEGORIES["religious"] + FILTER_CATEGORIES["schools"]
 
+# Shared read-only default for missing nested objects (avoids a new {} per lookup)
+_EMPTY = {}
+
+# Compact per-venue record (a tuple, so far smaller than a dict per venue)
+Venue = namedtuple("Venue", "name category city state country lat lng")
+
+# Indexed by datetime.weekday() and datetime.month - 1 (avoids strftime per check-in)
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+MONTH_ABBR = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+TIME_OF_DAY = ("morning", "afternoon", "evening", "night")
+
 
 def ordinal(n: int) -> str:
     """Return ordinal string for a number (1st, 2nd, 3rd, etc.)."""
@@ -118,26 +145,41 @@ def ordinal(n: int) -> str:
     return f"{n}{suffix}"
 
 
+def _intern(value):
+    """Intern strings so repeated city/category/country keys share one object."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 def format_date_ordinal(dt: datetime) -> str:
     """Format date as 'January 1st' style."""
     return f"{dt.strftime('%B')} {ordinal(dt.day)}"
 
 
-def analyze_checkins(checkins: list, exclude_sensitive: bool = False, exclude_filters: list = None) -> dict:
+def analyze_checkins_json(checkins_json: bytes, **kwargs) -> dict:
+    """
+    Analyze check-ins passed as a JSON array (see analyze_checkins for kwargs).
+
+    Used to hand check-ins to a worker process: orjson-encoding the list is
+    several times faster than pickling it, which the parent does under the GIL.
+    """
+    return analyze_checkins(orjson.loads(checkins_json), **kwargs)
+
+
+def analyze_checkins(checkins: Iterable, exclude_sensitive: bool = False, exclude_filters: list = None) -> dict:
     """
-    Analyze a list of Foursquare check-ins and return statistics.
+    Analyze Foursquare check-ins and return statistics.
+
+    Check-ins are consumed in a single pass, so any iterable (e.g. a generator
+    streaming pages from the API) works as well as a list.
 
     Args:
-        checkins: List of check-in objects from Foursquare API
+        checkins: Iterable of check-in objects from Foursquare API
         exclude_sensitive: If True, exclude churches and schools for privacy (legacy)
         exclude_filters: List of filter types to exclude: "religious", "schools", "residential", "medical"
 
     Returns:
         Dictionary with all computed statistics
     """
-    if not checkins:
-        return {}
-
     # Build list of categories to exclude
     categories_to_exclude = []
 
@@ -150,50 +192,42 @@ def analyze_checkins(checkins: list, exclude_sensitive: bool = False, exclude_fi
     elif exclude_sensitive:
         categories_to_exclude = SENSITIVE_CATEGORIES
 
-    # Filter out venues if any exclusions are requested
+    # Excluded venues are skipped inside the main loop; one alternation regex
+    # scans each name once instead of once per keyword
+    excluded_re = None
     if categories_to_exclude:
-        filtered_checkins = []
-        for checkin in checkins:
-            venue = checkin.get("venue", {})
-            venue_name = venue.get("name", "").lower()
-            categories = venue.get("categories", [])
-            category_names = [cat.get("name", "").lower() for cat in categories]
-
-            # Check if any category matches excluded categories
-            is_excluded = any(
-                any(excluded in cat_name for excluded in categories_to_exclude)
-                for cat_name in category_names
-            )
-
-            # Also check venue name for excluded keywords
-            if not is_excluded:
-                is_excluded = any(excluded in venue_name for excluded in categories_to_exclude)
-
-            if not is_excluded:
-                filtered_checkins.append(checkin)
-
-        checkins = filtered_checkins
+        excluded_re = re.compile("|".join(re.escape(excluded) for excluded in categories_to_exclude))
 
     stats = {}
 
-    # Basic counts
-    stats["total_checkins"] = len(checkins)
+    # Basic counts (check-ins left after exclusions)
+    has_checkins = False
+    total_checkins = 0
 
-    # Unique venues
+    # Unique venues (venue_ids records each check-in's venue, aggregated after the loop)
     venues = {}
+    venue_ids = []
     venue_counts = Counter()
     category_counts = Counter()
     city_counts = Counter()
     country_counts = Counter()
 
     # Time distributions
-    hourly = Counter()
+    hourly = [0] * 24  # Indexed by hour
     daily = Counter()
     monthly = Counter()
 
-    # Date tracking for streaks
+    # Date tracking for streaks (date ordinals, see date.toordinal)
     checkin_dates = set()
     checkins_per_day = Counter()
+    unique_venues_per_day = defaultdict(set)
+
+    # First and last check-in
+    first_checkin = last_checkin = None
+    first_ts = last_ts = 0
+
+    # International check-ins
+    us_checkins = 0
 
     # Friends
     friend_counts = Counter()
@@ -203,66 +237,76 @@ def analyze_checkins(checkins: list, exclude_sensitive: bool = False, exclude_fi
     checkins_with_shouts = 0
     total_photos = 0
 
-    # Location tracking for map
-    map_points = defaultdict(list)
+    # Location tracking for map (visit counts per venue name at each point)
+    map_points = defaultdict(Counter)
 
-    for checkin in checkins:
-        venue = checkin.get("venue", {})
-        venue_id = venue.get("id", "unknown")
-        venue_name = venue.get("name", "Unknown Venue")
+    # Timezone offsets repeat heavily, so reuse one timedelta per offset
+    tz_deltas = {}
 
-        # Count venue visits
-        venue_counts[venue_name] += 1
-
-        # Store venue info
-        if venue_id not in venues:
-            location = venue.get("location", {})
-            categories = venue.get("categories", [])
-            primary_category = categories[0]["name"] if categories else "Other"
-
-            venues[venue_id] = {
-                "name": venue_name,
-                "category": primary_category,
-                "city": location.get("city", "Unknown"),
-                "state": location.get("state", ""),
-                "country": location.get("country", "Unknown"),
-                "lat": location.get("lat"),
-                "lng": location.get("lng")
-            }
+    for checkin in checkins:
+        has_checkins = True
+        venue = checkin.get("venue", _EMPTY)
 
-        venue_info = venues[venue_id]
+        if excluded_re is not None:
+            # Check if any category matches excluded categories
+            is_excluded = any(
+                excluded_re.search(cat.get("name", "").lower())
+                for cat in venue.get("categories") or ()
+            )
 
-        # Count categories
-        category_counts[venue_info["category"]] += 1
+            # Also check venue name for excluded keywords
+            if is_excluded or excluded_re.search(venue.get("name", "").lower()):
+                continue
 
-        # Count cities
-        city_key = venue_info["city"]
-        if venue_info["state"]:
-            city_key = f"{venue_info['city']}, {venue_info['state']}"
-        elif venue_info["country"] != "United States":
-            city_key = f"{venue_info['city']}, {venue_info['country']}"
-        city_counts[city_key] += 1
+        total_checkins += 1
+        venue_id = venue.get("id", "unknown")
+        venue_name = venue.get("name", "Unknown Venue")
 
-        # Count countries
-        country_counts[venue_info["country"]] += 1
+        # Record venue visit
+        venue_ids.append(venue_id)
+
+        # Store venue info (parsed only the first time a venue is seen)
+        venue_info = venues.get(venue_id)
+        if venue_info is None:
+            location = venue.get("location", _EMPTY)
+            categories = venue.get("categories") or ()
+            primary_category = _intern(categories[0]["name"]) if categories else "Other"
+
+            venue_info = venues[venue_id] = Venue(
+                name=venue_name,
+                category=primary_category,
+                city=_intern(location.get("city", "Unknown")),
+                state=_intern(location.get("state", "")),
+                country=_intern(location.get("country", "Unknown")),
+                lat=location.get("lat"),
+                lng=location.get("lng")
+            )
 
         # Time analysis - use each check-in's own timezone offset for local time
         created_at = checkin.get("createdAt", 0)
         checkin_tz_offset = checkin.get("timeZoneOffset", 0)  # Minutes from UTC
+        if first_checkin is None or created_at < first_ts:
+            first_checkin, first_ts = checkin, created_at
+        if last_checkin is None or created_at > last_ts:
+            last_checkin, last_ts = checkin, created_at
         # Convert UTC timestamp to datetime, then apply check-in's local timezone
         dt_utc = datetime.utcfromtimestamp(created_at)
-        dt = dt_utc + timedelta(minutes=checkin_tz_offset)
+        tz_delta = tz_deltas.get(checkin_tz_offset)
+        if tz_delta is None:
+            tz_delta = tz_deltas[checkin_tz_offset] = timedelta(minutes=checkin_tz_offset)
+        dt = dt_utc + tz_delta
 
         hourly[dt.hour] += 1
-        daily[dt.strftime("%A")] += 1
-        monthly[dt.strftime("%b")] += 1
+        daily[DAY_NAMES[dt.weekday()]] += 1
+        monthly[MONTH_ABBR[dt.month - 1]] += 1
 
-        date_str = dt.strftime("%Y-%m-%d")
-        checkin_dates.add(date_str)
+        date_str = dt.date().isoformat()
+        checkin_dates.add(dt.toordinal())
         checkins_per_day[date_str] += 1
+        unique_venues_per_day[date_str].add(venue_name)
 
         # Friends
-        with_friends = checkin.get("with", [])
+        with_friends = checkin.get("with")
         if with_friends:
             checkins_with_friends += 1
             for friend in with_friends:
@@ -273,40 +317,59 @@ def analyze_checkins(checkins: list, exclude_sensitive: bool = False, exclude_fi
         # Shouts and photos
         if checkin.get("shout"):
             checkins_with_shouts += 1
-        total_photos += len(checkin.get("photos", {}).get("items", []))
+        total_photos += len(checkin.get("photos", _EMPTY).get("items") or ())
 
         # Map points
-        if venue_info["lat"] and venue_info["lng"]:
-            lat_rounded = round(venue_info["lat"], 4)
-            lng_rounded = round(venue_info["lng"], 4)
-            map_points[(lat_rounded, lng_rounded)].append(f"{venue_name}(1)")
+        if venue_info.lat and venue_info.lng:
+            lat_rounded = round(venue_info.lat, 4)
+            lng_rounded = round(venue_info.lng, 4)
+            map_points[(lat_rounded, lng_rounded)][venue_name] += 1
+
+    # Group visits by venue (Counter counts an iterable in C), then roll each
+    # venue's visit count up into the venue, category, city and country totals
+    for venue_id, count in Counter(venue_ids).items():
+        venue_info = venues[venue_id]
+        venue_counts[venue_info.name] += count
+        category_counts[venue_info.category] += count
+
+        # Count cities
+        city_key = venue_info.city
+        if venue_info.state:
+            city_key = _intern(f"{venue_info.city}, {venue_info.state}")
+        elif venue_info.country != "United States":
+            city_key = _intern(f"{venue_info.city}, {venue_info.country}")
+        city_counts[city_key] += count
+
+        # Count countries
+        country_counts[venue_info.country] += count
+        if venue_info.country == "United States":
+            us_checkins += count
+
+    if not has_checkins:
+        return {}
+
+    stats["total_checkins"] = total_checkins
 
     # Top venues
     stats["unique_venues"] = len(venues)
-    stats["top_venues"] = [
-        {
-            "name": name,
-            "count": count,
-            **{k: v for k, v in venues.get(
-                next((vid for vid, v in venues.items() if v["name"] == name), {}
-            ), {}).items() if k != "name"}
-        }
-        for name, count in venue_counts.most_common(10)
-    ]
 
-    # Fix top_venues to include venue details
-    top_venues_fixed = []
+    # Index venues by name (first venue seen wins) for O(1) lookups
+    venues_by_name = {}
+    for venue_data in venues.values():
+        venues_by_name.setdefault(venue_data.name, venue_data)
+
+    top_venues = []
     for name, count in venue_counts.most_common(10):
-        venue_data = next((v for v in venues.values() if v["name"] == name), {})
-        top_venues_fixed.append({
+        venue_data = venues_by_name[name]
+        top_venues.append({
             "name": name,
             "count": count,
-            "category": venue_data.get("category", ""),
-            "city": venue_data.get("city", ""),
-            "state": venue_data.get("state", ""),
-            "country": venue_data.get("country", "")
+            "category": venue_data.category,
+            "city": venue_data.city,
+            "state": venue_data.state,
+            "country": venue_data.country
         })
-    stats["top_venues"] = top_venues_fixed
+    stats["top_venues"] = top_venues
 
     # Top categories
     stats["top_categories"] = [
@@ -329,36 +392,29 @@ def analyze_checkins(checkins: list, exclude_sensitive: bool = False, exclude_fi
     ]
 
     # Time distributions
-    stats["hourly_distribution"] = {str(h): hourly.get(h, 0) for h in range(24)}
-    stats["monthly_distribution"] = {
-        month: monthly.get(month, 0)
-        for month in ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-    }
-
-    day_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    stats["daily_distribution"] = {day: daily.get(day, 0) for day in day_order}
+    stats["hourly_distribution"] = {str(h): hourly[h] for h in range(24)}
+    stats["monthly_distribution"] = {month: monthly.get(month, 0) for month in MONTH_ABBR}
+    stats["daily_distribution"] = {day: daily.get(day, 0) for day in DAY_NAMES}
 
     # Peak times
-    stats["peak_hour"] = max(hourly, key=hourly.get) if hourly else 0
+    stats["peak_hour"] = max(range(24), key=hourly.__getitem__) if total_checkins else 0
     stats["peak_hour_formatted"] = f"{stats['peak_hour']}am" if stats["peak_hour"] < 12 else f"{stats['peak_hour']-12 or 12}pm"
     stats["busiest_day"] = max(daily, key=daily.get) if daily else "Unknown"
     stats["busiest_month"] = max(monthly, key=monthly.get) if monthly else "Unknown"
 
     # Activity stats
-    sorted_dates = sorted(checkin_dates)
+    sorted_ordinals = sorted(checkin_dates)
     stats["days_active"] = len(checkin_dates)
 
-    if sorted_dates:
-        first_date = datetime.strptime(sorted_dates[0], "%Y-%m-%d")
-        last_date = datetime.strptime(sorted_dates[-1], "%Y-%m-%d")
-        total_days = (last_date - first_date).days + 1
+    if sorted_ordinals:
+        total_days = sorted_ordinals[-1] - sorted_ordinals[0] + 1
         stats["total_days_2025"] = total_days
         stats["activity_percentage"] = round(len(checkin_dates) / total_days * 100, 1) if total_days > 0 else 0
     else:
         stats["total_days_2025"] = 0
         stats["activity_percentage"] = 0
 
-    stats["avg_checkins_per_active_day"] = round(len(checkins) / len(checkin_dates), 1) if checkin_dates else 0
+    stats["avg_checkins_per_active_day"] = round(total_checkins / len(checkin_dates), 1) if checkin_dates else 0
 
     # Busiest day
     if checkins_per_day:
@@ -370,81 +426,76 @@ def analyze_checkins(checkins: list, exclude_sensitive: bool = False, exclude_fi
         stats["max_checkins_day"] = ""
         stats["max_checkins_count"] = 0
 
-    # Streak calculation
-    stats["longest_streak"] = calculate_longest_streak(sorted_dates)
+    # Streak and gap calculation (one pass over the sorted dates)
+    longest_streak, max_gap, gap_start, gap_end = calculate_streak_and_gap(sorted_ordinals)
+    stats["longest_streak"] = longest_streak
 
     # Friends stats
     stats["checkins_with_friends"] = checkins_with_friends
-    stats["friend_percentage"] = round(checkins_with_friends / len(checkins) * 100, 1) if checkins else 0
+    stats["friend_percentage"] = round(checkins_with_friends / total_checkins * 100, 1) if total_checkins else 0
     stats["top_friends"] = [
         {"name": name, "count": count}
         for name, count in friend_counts.most_common(5)
     ]
 
     # Solo stats
-    stats["solo_checkins"] = len(checkins) - checkins_with_friends
-    stats["solo_percentage"] = round(stats["solo_checkins"] / len(checkins) * 100, 1) if checkins else 0
+    stats["solo_checkins"] = total_checkins - checkins_with_friends
+    stats["solo_percentage"] = round(stats["solo_checkins"] / total_checkins * 100, 1) if total_checkins else 0
 
     # Shouts and photos
     stats["checkins_with_shouts"] = checkins_with_shouts
-    stats["shout_percentage"] = round(checkins_with_shouts / len(checkins) * 100, 1) if checkins else 0
+    stats["shout_percentage"] = round(checkins_with_shouts / total_checkins * 100, 1) if total_checkins else 0
     stats["total_photos"] = total_photos
 
     # Time personality
-    morning = sum(hourly.get(h, 0) for h in range(5, 12))
-    afternoon = sum(hourly.get(h, 0) for h in range(12, 17))
-    evening = sum(hourly.get(h, 0) for h in range(17, 21))
-    night = sum(hourly.get(h, 0) for h in list(range(21, 24)) + list(range(0, 5)))
-
-    stats["time_of_day"] = {
-        "morning": morning,
-        "afternoon": afternoon,
-        "evening": evening,
-        "night": night
-    }
+    time_buckets = [
+        sum(hourly[5:12]),                  # morning
+        sum(hourly[12:17]),                 # afternoon
+        sum(hourly[17:21]),                 # evening
+        sum(hourly[21:]) + sum(hourly[:5])  # night
+    ]
+
+    stats["time_of_day"] = dict(zip(TIME_OF_DAY, time_buckets))
 
-    max_time = max([("morning", morning), ("afternoon", afternoon), ("evening", evening), ("night", night)], key=lambda x: x[1])
+    max_time = TIME_OF_DAY[time_buckets.index(max(time_buckets))]
     time_personalities = {
         "morning": "Early Bird",
         "afternoon": "Afternoon Adventurer",
         "evening": "Evening Wanderer",
         "night": "Night Owl"
     }
-    stats["time_personality"] = time_personalities.get(max_time[0], "Explorer")
+    stats["time_personality"] = time_personalities.get(max_time, "Explorer")
 
     # Weekend vs weekday
     weekend = daily.get("Saturday", 0) + daily.get("Sunday", 0)
-    weekday = sum(daily.get(d, 0) for d in ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"])
+    weekday = sum(daily.get(d, 0) for d in DAY_NAMES[:5])
     total = weekend + weekday
     stats["weekend_percentage"] = round(weekend / total * 100, 1) if total > 0 else 0
     stats["weekday_percentage"] = round(weekday / total * 100, 1) if total > 0 else 0
 
     # First and last check-in
-    if checkins:
-        first_checkin = min(checkins, key=lambda x: x.get("createdAt", 0))
-        last_checkin = max(checkins, key=lambda x: x.get("createdAt", 0))
-
+    if first_checkin is not None:
         # Use each check-in's own timezone offset
         first_dt_utc = datetime.utcfromtimestamp(first_checkin.get("createdAt", 0))
         last_dt_utc = datetime.utcfromtimestamp(last_checkin.get("createdAt", 0))
-        first_dt = first_dt_utc + timedelta(minutes=first_checkin.get("timeZoneOffset", 0))
-        last_dt = last_dt_utc + timedelta(minutes=last_checkin.get("timeZoneOffset", 0))
+        first_dt = first_dt_utc + tz_deltas[first_checkin.get("timeZoneOffset", 0)]
+        last_dt = last_dt_utc + tz_deltas[last_checkin.get("timeZoneOffset", 0)]
 
         stats["first_checkin"] = {
-            "venue": first_checkin.get("venue", {}).get("name", "Unknown"),
+            "venue": first_checkin.get("venue", _EMPTY).get("name", "Unknown"),
             "date": format_date_ordinal(first_dt),
             "time": first_dt.strftime("%I:%M %p").lstrip("0")
         }
         stats["last_checkin"] = {
-            "venue": last_checkin.get("venue", {}).get("name", "Unknown"),
+            "venue": last_checkin.get("venue", _EMPTY).get("name", "Unknown"),
             "date": format_date_ordinal(last_dt),
             "time": last_dt.strftime("%I:%M %p").lstrip("0")
         }
 
     # Map data (grouped by location)
     stats["map_points"] = [
-        {"lat": lat, "lng": lng, "v": ",".join(venues)}
-        for (lat, lng), venues in map_points.items()
+        {"lat": lat, "lng": lng, "v": ",".join(f"{name}({count})" for name, count in names.items())}
+        for (lat, lng), names in map_points.items()
     ]
 
     # One-time venues (visited only once)
@@ -454,73 +505,65 @@ def analyze_checkins(checkins: list, exclude_sensitive: bool = False, exclude_fi
 
     # Furthest venue from home city (most common city)
     if city_counts and venues:
-        home_city = city_counts.most_common(1)[0][0]
+        home_city = max(city_counts, key=city_counts.__getitem__)
         stats["home_city"] = home_city
 
         # Find home city coordinates (average of all venues in home city)
-        home_venues = [v for v in venues.values() if v.get("city") == home_city.split(",")[0]]
-        if home_venues:
-            home_lat = sum(v.get("lat", 0) for v in home_venues if v.get("lat")) / len([v for v in home_venues if v.get("lat")])
-            home_lng = sum(v.get("lng", 0) for v in home_venues if v.get("lng")) / len([v for v in home_venues if v.get("lng")])
-
-            # Find furthest venue
-            max_distance = 0
+        home_city_name = home_city.split(",")[0]
+        sum_lat = sum_lng = 0
+        home_venue_count = 0
+        for v in venues.values():
+            if v.city == home_city_name and v.lat and v.lng:
+                sum_lat += v.lat
+                sum_lng += v.lng
+                home_venue_count += 1
+
+        if home_venue_count:
+            home_lat = sum_lat / home_venue_count
+            home_lng = sum_lng / home_venue_count
+
+            # Find furthest venue. The haversine term grows with distance, so
+            # compare it directly and only compute the full distance once.
+            home_lat_rad = math.radians(home_lat)
+            home_lng_rad = math.radians(home_lng)
+            cos_home_lat = math.cos(home_lat_rad)
+            max_a = 0
             furthest_venue = None
             for venue_data in venues.values():
-                if venue_data.get("lat") and venue_data.get("lng"):
-                    dist = haversine_distance(home_lat, home_lng, venue_data["lat"], venue_data["lng"])
-                    if dist > max_distance:
-                        max_distance = dist
+                if venue_data.lat and venue_data.lng:
+                    lat_rad = math.radians(venue_data.lat)
+                    half_dlat = (lat_rad - home_lat_rad) / 2
+                    half_dlng = (math.radians(venue_data.lng) - home_lng_rad) / 2
+                    a = math.sin(half_dlat)**2 + cos_home_lat * math.cos(lat_rad) * math.sin(half_dlng)**2
+                    if a > max_a:
+                        max_a = a
                         furthest_venue = venue_data
 
             if furthest_venue:
+                max_distance = haversine_distance(home_lat, home_lng, furthest_venue.lat, furthest_venue.lng)
                 stats["furthest_venue"] = {
-                    "name": furthest_venue["name"],
-                    "city": furthest_venue["city"],
-                    "country": furthest_venue["country"],
+                    "name": furthest_venue.name,
+                    "city": furthest_venue.city,
+                    "country": furthest_venue.country,
                     "distance_miles": round(max_distance)
                 }
 
     # International check-ins
-    us_checkins = sum(1 for checkin in checkins
-                      if checkin.get("venue", {}).get("location", {}).get("country") == "United States")
-    international_checkins = len(checkins) - us_checkins
+    international_checkins = total_checkins - us_checkins
     stats["international_checkins"] = international_checkins
-    stats["international_percentage"] = round(international_checkins / len(checkins) * 100, 1) if checkins else 0
+    stats["international_percentage"] = round(international_checkins / total_checkins * 100, 1) if total_checkins else 0
 
     # Day with most unique venues
-    unique_venues_per_day = defaultdict(set)
-    for checkin in checkins:
-        created_at = checkin.get("createdAt", 0)
-        checkin_tz = checkin.get("timeZoneOffset", 0)
-        dt_utc = datetime.utcfromtimestamp(created_at)
-        dt = dt_utc + timedelta(minutes=checkin_tz)
-        date_str = dt.strftime("%Y-%m-%d")
-        venue_name = checkin.get("venue", {}).get("name", "Unknown")
-        unique_venues_per_day[date_str].add(venue_name)
-
     if unique_venues_per_day:
         max_unique_day = max(unique_venues_per_day.keys(), key=lambda d: len(unique_venues_per_day[d]))
         stats["most_unique_venues_day"] = max_unique_day
         stats["most_unique_venues_count"] = len(unique_venues_per_day[max_unique_day])
 
     # Longest gap between check-ins
-    if len(sorted_dates) > 1:
-        max_gap = 0
-        gap_start = None
-        gap_end = None
-        for i in range(1, len(sorted_dates)):
-            prev_date = datetime.strptime(sorted_dates[i-1], "%Y-%m-%d")
-            curr_date = datetime.strptime(sorted_dates[i], "%Y-%m-%d")
-            gap = (curr_date - prev_date).days - 1  # Days without check-ins
-            if gap > max_gap:
-                max_gap = gap
-                gap_start = sorted_dates[i-1]
-                gap_end = sorted_dates[i]
-
+    if len(sorted_ordinals) > 1:
         stats["longest_gap_days"] = max_gap
-        stats["longest_gap_start"] = gap_start
-        stats["longest_gap_end"] = gap_end
+        stats["longest_gap_start"] = date.fromordinal(gap_start).isoformat() if gap_start else None
+        stats["longest_gap_end"] = date.fromordinal(gap_end).isoformat() if gap_end else None
 
     # Determine personality type
     stats["personality"] = determine_personality(stats, category_counts, city_counts)
@@ -546,6 +589,17 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     return R * c
 
 
+@lru_cache(maxsize=2048)
+def category_tag(category: str) -> int:
+    """Return a bitmask of the category-based personality types matching a category name."""
+    cat_lower = category.lower()
+    tag = 0
+    for type_id, keywords in PERSONALITY_KEYWORDS.items():
+        if any(keyword in cat_lower for keyword in keywords):
+            tag |= PERSONALITY_CATEGORY_BITS[type_id]
+    return tag
+
+
 def determine_personality(stats, category_counts, city_counts):
     """Determine user's check-in personality based on their patterns."""
     scores = {}
@@ -557,17 +611,19 @@ def determine_personality(stats, category_counts, city_counts):
     # Calculate unique venue ratio once (used by multiple types)
     unique_ratio = stats.get("unique_venues", 0) / total_checkins if total_checkins else 0
 
+    # Collapse category counts onto personality tags so each type is a mask test
+    tag_counts = Counter()
+    for cat, count in category_counts.items():
+        tag_counts[category_tag(cat)] += count
+
     # Score each personality type
     for type_id, type_info in PERSONALITY_TYPES.items():
         score = 0
 
         # Category-based scoring (with minimum percentage threshold)
         if "categories" in type_info:
-            category_checkins = sum(
-                category_counts.get(cat, 0)
-                for cat in category_counts.keys()
-                if any(keyword.lower() in cat.lower() for keyword in type_info["categories"])
-            )
+            type_bit = PERSONALITY_CATEGORY_BITS[type_id]
+            category_checkins = sum(count for tag, count in tag_counts.items() if tag & type_bit)
             pct = category_checkins / total_checkins if total_checkins else 0
             min_pct = type_info.get("min_percentage", 0)
             # Only score if meets minimum percentage threshold
@@ -597,7 +653,7 @@ def determine_personality(stats, category_counts, city_counts):
                     score = 1 - unique_ratio
             elif "home_city_percentage" in threshold:
                 if city_counts:
-                    home_count = city_counts.most_common(1)[0][1]
+                    home_count = max(city_counts.values())
                     home_pct = home_count / total_checkins * 100 if total_checkins else 0
                     if home_pct >= threshold["home_city_percentage"]:
                         score = home_pct / 100
@@ -715,7 +771,7 @@ def generate_year_summary(stats, category_counts, city_counts):
 
     # Location context
     if city_counts:
-        home_city = city_counts.most_common(1)[0][0].split(",")[0].strip()
+        home_city = max(city_counts, key=city_counts.__getitem__).split(",")[0].strip()
         other_cities = [
             c[0].split(",")[0].strip()
             for c in city_counts.most_common(4)[1:]
@@ -750,25 +806,39 @@ def generate_year_summary(stats, category_counts, city_counts):
         return f"{parts[0]}, {parts[1]}, {parts[2]}."
 
 
-def calculate_longest_streak(sorted_dates: list) -> int:
-    """Calculate the longest consecutive day streak."""
-    if not sorted_dates:
-        return 0
+def calculate_streak_and_gap(sorted_ordinals: list) -> tuple:
+    """
+    Calculate the longest consecutive day streak and the longest gap from sorted date ordinals.
+
+    Returns:
+        Tuple of (longest_streak, longest_gap_days, gap_start_ordinal, gap_end_ordinal).
+        The gap ordinals are None when there is no gap.
+    """
+    if not sorted_ordinals:
+        return 0, 0, None, None
 
     max_streak = 1
     current_streak = 1
-
-    for i in range(1, len(sorted_dates)):
-        prev_date = datetime.strptime(sorted_dates[i-1], "%Y-%m-%d")
-        curr_date = datetime.strptime(sorted_dates[i], "%Y-%m-%d")
-
-        if (curr_date - prev_date).days == 1:
+    max_gap = 0
+    gap_start = None
+    gap_end = None
+
+    prev = sorted_ordinals[0]
+    for curr in sorted_ordinals[1:]:
+        diff = curr - prev
+        if diff == 1:
             current_streak += 1
-            max_streak = max(max_streak, current_streak)
+            if current_streak > max_streak:
+                max_streak = current_streak
         else:
             current_streak = 1
+            if diff - 1 > max_gap:  # Days without check-ins
+                max_gap = diff - 1
+                gap_start = prev
+                gap_end = curr
+        prev = curr
 
-    return max_streak
+    return max_streak, max_gap, gap_start, gap_end
 
 
 def analyze_historical_data(checkins: list) -> dict:
@@ -786,7 +856,7 @@ def analyze_historical_data(checkins: list) -> dict:
 
     # Group check-ins by year
     years_data = defaultdict(lambda: {
-        "checkins": [],
+        "total": 0,
         "venues": Counter(),
         "cities": Counter()
     })
@@ -798,12 +868,12 @@ def analyze_historical_data(checkins: list) -> dict:
         dt = dt_utc + timedelta(minutes=checkin_tz)
         year = dt.year
 
-        venue = checkin.get("venue", {})
+        venue = checkin.get("venue", _EMPTY)
         venue_name = venue.get("name", "Unknown")
-        location = venue.get("location", {})
+        location = venue.get("location", _EMPTY)
         city = location.get("city", "Unknown")
 
-        years_data[year]["checkins"].append(checkin)
+        years_data[year]["total"] += 1
         years_data[year]["venues"][venue_name] += 1
         years_data[year]["cities"][city] += 1
 
@@ -816,7 +886,7 @@ def analyze_historical_data(checkins: list) -> dict:
 
         years.append({
             "year": year,
-            "total": len(data["checkins"]),
+            "total": data["total"],
             "top_venue": top_venue[0][0] if top_venue else "Unknown",
             "top_venue_count": top_venue[0][1] if top_venue else 0,
             "top_city": top_city[0][0] if top_city else "Unknown",
@@ -2,50 +2,155 @@
 Swarm Wrapped - A web app to generate Spotify Wrapped-style reports from Foursquare Swarm data.
 """
 
+import asyncio
+import atexit
+import hashlib
 import os
 import httpx
 import logging
+import multiprocessing
+import orjson
+import queue
 import time
-from datetime import datetime
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from fastapi import Depends, FastAPI, Request, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 
-from analyze import analyze_checkins
+from analyze import analyze_checkins_json
+from sessions import RedisSessionMiddleware, regenerate_session
+
+# Configure logging. Records are queued and written by a background thread,
+# so slow log output never blocks the event loop.
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+log_listener.start()
+atexit.register(log_listener.stop)
 
-# Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[QueueHandler(log_queue)]
 )
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Swarm Wrapped")
+# Foursquare OAuth configuration
+FOURSQUARE_CLIENT_ID = os.environ.get("FOURSQUARE_CLIENT_ID")
+FOURSQUARE_CLIENT_SECRET = os.environ.get("FOURSQUARE_CLIENT_SECRET")
+FOURSQUARE_REDIRECT_URI = os.environ.get("FOURSQUARE_REDIRECT_URI", "http://localhost:8000/callback")
 
-# Session middleware for storing OAuth tokens
-app.add_middleware(
-    SessionMiddleware,
-    secret_key=os.environ.get("SESSION_SECRET", "dev-secret-change-in-production")
-)
+# Foursquare API endpoints
+FOURSQUARE_AUTH_URL = "https://foursquare.com/oauth2/authenticate"
+FOURSQUARE_TOKEN_URL = "https://foursquare.com/oauth2/access_token"
+FOURSQUARE_API_BASE = "https://api.foursquare.com/v2"
+
+# Optional Redis cache for computed reports (caching is disabled when unset)
+REDIS_URL = os.environ.get("REDIS_URL")
+STATS_CACHE_TTL = 3600  # seconds
+PROFILE_CACHE_TTL = 86400  # seconds
+
+# Bump when analyze_checkins output changes so browsers drop cached reports
+STATS_VERSION = 1
+# Reports are personal location data: browsers must revalidate every view (a
+# cheap 304 via the ETag) so a logout or a different sign-in takes effect at once
+REPORT_CACHE_CONTROL = "private, no-cache"
+
+# Background report pre-warming after login (only useful with the Redis cache)
+PREWARM_CONCURRENCY = 4
+prewarm_semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+background_tasks = set()  # Strong references so running tasks aren't garbage collected
+inflight_reports = {}  # Report builds in progress, so concurrent identical requests share one
+
+# Worker processes for check-in analysis (CPU-bound, so kept off the event loop)
+ANALYZE_WORKERS = 2
+
+
+def new_analyze_pool() -> ProcessPoolExecutor:
+    """Create the worker pool for check-in analysis."""
+    # Workers start lazily, after the log listener thread and event loop are
+    # running; forking a threaded process can deadlock, so use a forkserver
+    return ProcessPoolExecutor(
+        max_workers=ANALYZE_WORKERS,
+        mp_context=multiprocessing.get_context("forkserver")
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown."""
+    # One pooled client for all Foursquare calls so connections (and TLS sessions) are reused.
+    # HTTP/2 multiplexes the parallel page requests over one connection, and
+    # compressed responses shrink the repetitive check-in JSON considerably.
+    app.state.fsq_client = httpx.AsyncClient(
+        base_url=FOURSQUARE_API_BASE,
+        http2=True,
+        headers={"Accept-Encoding": "gzip, deflate, br"},
+        timeout=httpx.Timeout(10.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100)
+    )
+    app.state.redis = aioredis.from_url(REDIS_URL) if REDIS_URL else None
+    app.state.analyze_pool = new_analyze_pool()
+
+    # Compile every template up front so the first requests don't pay for it
+    for name in TEMPLATE_NAMES:
+        templates.env.get_template(name)
+
+    yield
+    await app.state.fsq_client.aclose()
+    app.state.analyze_pool.shutdown(wait=False, cancel_futures=True)
+    if app.state.redis is not None:
+        await app.state.redis.aclose()
+
+
+app = FastAPI(title="Swarm Wrapped", lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Compress larger responses (the report page and /api/generate JSON)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# Session middleware for storing OAuth tokens. With Redis available, session
+# data stays server-side and the cookie only carries a session id. Either
+# cookie grants access to the token, so it is only sent over HTTPS whenever
+# the app is served over HTTPS (i.e. anywhere but local development).
+SESSION_HTTPS_ONLY = FOURSQUARE_REDIRECT_URI.startswith("https://")
+if REDIS_URL:
+    app.add_middleware(RedisSessionMiddleware, https_only=SESSION_HTTPS_ONLY)
+else:
+    app.add_middleware(
+        SessionMiddleware,
+        secret_key=os.environ.get("SESSION_SECRET", "dev-secret-change-in-production"),
+        https_only=SESSION_HTTPS_ONLY
+    )
 
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all requests with timing info."""
-    start_time = time.time()
+    # Skip static files entirely to reduce noise
+    if request.url.path.startswith("/static"):
+        return await call_next(request)
+
+    start_time = time.perf_counter()
 
     response = await call_next(request)
 
     # Calculate request duration
-    duration_ms = (time.time() - start_time) * 1000
+    duration_ms = (time.perf_counter() - start_time) * 1000
 
-    # Log request (skip static files to reduce noise)
-    if not request.url.path.startswith("/static"):
-        logger.info(
-            f"{request.method} {request.url.path} - {response.status_code} - {duration_ms:.0f}ms"
-        )
+    logger.info(
+        f"{request.method} {request.url.path} - {response.status_code} - {duration_ms:.0f}ms"
+    )
 
     return response
 
@@ -53,15 +158,15 @@ async def log_requests(request: Request, call_next):
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Foursquare OAuth configuration
-FOURSQUARE_CLIENT_ID = os.environ.get("FOURSQUARE_CLIENT_ID")
-FOURSQUARE_CLIENT_SECRET = os.environ.get("FOURSQUARE_CLIENT_SECRET")
-FOURSQUARE_REDIRECT_URI = os.environ.get("FOURSQUARE_REDIRECT_URI", "http://localhost:8000/callback")
+# Compiled templates are cached by Jinja; skip the per-render file mtime check
+# unless template hot-reloading is wanted (e.g. during local development)
+templates.env.auto_reload = os.environ.get("TEMPLATES_AUTO_RELOAD", "").lower() in ("1", "true", "yes")
+TEMPLATE_NAMES = ("index.html", "loading.html", "error.html", "wrapped.html")
 
-# Foursquare API endpoints
-FOURSQUARE_AUTH_URL = "https://foursquare.com/oauth2/authenticate"
-FOURSQUARE_TOKEN_URL = "https://foursquare.com/oauth2/access_token"
-FOURSQUARE_API_BASE = "https://api.foursquare.com/v2"
+
+async def get_token(request: Request) -> Optional[str]:
+    """Return the OAuth access token from the session (None if not logged in)."""
+    return request.session.get("access_token")
 
 
 @app.api_route("/health", methods=["GET", "HEAD"])
@@ -71,9 +176,8 @@ async def health():
 
 
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request):
+async def home(request: Request, token: Optional[str] = Depends(get_token)):
     """Landing page with connect button."""
-    token = request.session.get("access_token")
     return templates.TemplateResponse("index.html", {
         "request": request,
         "authenticated": token is not None
@@ -105,38 +209,46 @@ async def callback(request: Request, code: str = None, error: str = None):
         raise HTTPException(status_code=400, detail="No authorization code received")
 
     # Exchange code for access token
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            FOURSQUARE_TOKEN_URL,
-            params={
-                "client_id": FOURSQUARE_CLIENT_ID,
-                "client_secret": FOURSQUARE_CLIENT_SECRET,
-                "grant_type": "authorization_code",
-                "redirect_uri": FOURSQUARE_REDIRECT_URI,
-                "code": code
-            }
-        )
+    client = request.app.state.fsq_client
+    response = await client.get(
+        FOURSQUARE_TOKEN_URL,
+        params={
+            "client_id": FOURSQUARE_CLIENT_ID,
+            "client_secret": FOURSQUARE_CLIENT_SECRET,
+            "grant_type": "authorization_code",
+            "redirect_uri": FOURSQUARE_REDIRECT_URI,
+            "code": code
+        }
+    )
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Failed to get access token")
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Failed to get access token")
+    data = orjson.loads(response.content)
+    access_token = data.get("access_token")
 
-        data = response.json()
-        access_token = data.get("access_token")
+    if not access_token:
+        raise HTTPException(status_code=400, detail="No access token in response")
 
-        if not access_token:
-            raise HTTPException(status_code=400, detail="No access token in response")
+    # Store token in session, under a new session id so one known before login
+    # can't be used to reach it. Drop any user id left by a previous sign-in
+    # on this browser; it is set again once this token's profile is known.
+    regenerate_session(request)
+    request.session["access_token"] = access_token
+    request.session.pop("user_id", None)
 
-        # Store token in session
-        request.session["access_token"] = access_token
+    # Start building the report while the browser loads the /generate page
+    if request.app.state.redis is not None:
+        task = asyncio.create_task(prewarm_report(access_token))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
 
     return RedirectResponse(url="/generate")
 
 
 @app.get("/generate", response_class=HTMLResponse)
-async def generate(request: Request):
+async def generate(request: Request, token: Optional[str] = Depends(get_token)):
     """Fetch check-ins and generate the wrapped report."""
-    token = request.session.get("access_token")
-
     if not token:
         return RedirectResponse(url="/login")
 
@@ -144,24 +256,24 @@ async def generate(request: Request):
     return templates.TemplateResponse("loading.html", {"request": request})
 
 
-@app.get("/api/generate")
-async def api_generate(request: Request):
+@app.get("/api/generate", response_class=ORJSONResponse)
+async def api_generate(request: Request, token: Optional[str] = Depends(get_token)):
     """API endpoint to fetch and analyze check-ins."""
-    token = request.session.get("access_token")
-
     if not token:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    # Fetch check-ins from Foursquare
-    checkins = await fetch_all_checkins(token, year=2025)
+    etag = report_etag(request, token)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
 
-    if not checkins:
-        return {"error": "No check-ins found for 2025"}
+    # Fetch and analyze check-ins (served from cache when available). The
+    # profile is cached too, so this also warms it for the /wrapped page.
+    _, stats = await load_report(request, token, year=2025)
 
-    # Analyze the check-ins
-    stats = analyze_checkins(checkins)
+    if not stats:
+        return {"error": "No check-ins found for 2025"}
 
-    return stats
+    return ORJSONResponse(stats, headers={"ETag": etag, "Cache-Control": REPORT_CACHE_CONTROL})
 
 
 @app.get("/wrapped", response_class=HTMLResponse)
@@ -171,11 +283,10 @@ async def wrapped(
     exclude_religious: bool = False,
     exclude_schools: bool = False,
     exclude_residential: bool = False,
-    exclude_medical: bool = False
+    exclude_medical: bool = False,
+    token: Optional[str] = Depends(get_token)
 ):
     """Display the generated wrapped report."""
-    token = request.session.get("access_token")
-
     if not token:
         return RedirectResponse(url="/login")
 
@@ -190,23 +301,25 @@ async def wrapped(
     if exclude_medical:
         exclude_filters.append("medical")
 
+    etag = report_etag(request, token)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
     try:
-        # Fetch user profile and check-ins
-        user_profile = await fetch_user_profile(token)
-        checkins_2025 = await fetch_all_checkins(token, year=2025)
+        user_profile, stats = await load_report(
+            request,
+            token,
+            year=2025,
+            exclude_sensitive=exclude_sensitive,
+            exclude_filters=exclude_filters
+        )
 
-        if not checkins_2025:
+        if not stats:
             return templates.TemplateResponse("error.html", {
                 "request": request,
                 "error": "No check-ins found for 2025"
             })
 
-        # Use new granular filters if any are set, otherwise fall back to legacy
-        if exclude_filters:
-            stats = analyze_checkins(checkins_2025, exclude_filters=exclude_filters)
-        else:
-            stats = analyze_checkins(checkins_2025, exclude_sensitive=exclude_sensitive)
-
         # Get lifetime checkin count from user profile (fast - no extra API calls)
         lifetime_checkins = None
         if user_profile:
@@ -219,7 +332,7 @@ async def wrapped(
             last_name = user_profile.get("lastName", "")
             username = f"{first_name} {last_name}".strip() or user_profile.get("handle", "")
 
-        return templates.TemplateResponse("wrapped.html", {
+        response = templates.TemplateResponse("wrapped.html", {
             "request": request,
             "stats": stats,
             "lifetime_checkins": lifetime_checkins,
@@ -230,6 +343,9 @@ async def wrapped(
             "exclude_medical": exclude_medical,
             "username": username
         })
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = REPORT_CACHE_CONTROL
+        return response
 
     except RateLimitError:
         logger.warning("Rate limit error serving /wrapped")
@@ -254,28 +370,40 @@ async def wrapped(
 
 
 @app.get("/logout")
-async def logout(request: Request):
+async def logout(request: Request, token: Optional[str] = Depends(get_token)):
     """Clear session and logout."""
+    if token:
+        await invalidate_cached_profile(token)
     request.session.clear()
     return RedirectResponse(url="/")
 
 
 async def fetch_user_profile(token: str) -> dict:
-    """Fetch user profile from Foursquare API."""
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{FOURSQUARE_API_BASE}/users/self",
-            params={
-                "oauth_token": token,
-                "v": "20231201"
-            }
-        )
+    """Fetch user profile from Foursquare API, using the profile cache."""
+    key = profile_cache_key(token)
+    user = await cache_get(key)
+    if user is not None:
+        return user
+
+    client = app.state.fsq_client
+    response = await client.get(
+        "/users/self",
+        params={
+            "oauth_token": token,
+            "v": "20231201"
+        }
+    )
 
-        if response.status_code != 200:
-            return {}
+    if response.status_code != 200:
+        return {}
 
-        data = response.json()
-        return data.get("response", {}).get("user", {})
+    data = orjson.loads(response.content)
+    user = data.get("response", {}).get("user", {})
+
+    if user:
+        await cache_set(key, user, PROFILE_CACHE_TTL)
+
+    return user
 
 
 class RateLimitError(Exception):
@@ -288,54 +416,382 @@ class APIError(Exception):
     pass
 
 
+class ServerError(APIError):
+    """Raised when Foursquare API returns a 5xx error (worth retrying)."""
+    pass
+
+
+@lru_cache(maxsize=8)
+def year_bounds(year: int) -> tuple:
+    """Return (start, end) Unix timestamps covering a calendar year in UTC."""
+    start = int(datetime(year, 1, 1, tzinfo=timezone.utc).timestamp())
+    end = int(datetime(year, 12, 31, 23, 59, 59, tzinfo=timezone.utc).timestamp())
+    return start, end
+
+
+# Check-in pagination limits
+CHECKINS_PAGE_LIMIT = 250  # Max allowed by Foursquare API
+CHECKINS_MAX_OFFSET = 5000  # Safety limit on how deep we paginate
+CHECKINS_FETCH_CONCURRENCY = 5  # Parallel page requests per user, to stay polite about rate limits
+
+
+@retry(
+    retry=retry_if_exception_type((httpx.TransportError, ServerError)),
+    stop=stop_after_attempt(3),
+    wait=wait_random_exponential(min=0.3, max=3.0),
+    reraise=True
+)
+async def fetch_checkins_page(client: httpx.AsyncClient, params: dict) -> dict:
+    """
+    Fetch one page of check-ins, returning the `checkins` object from the response.
+
+    Transient failures (network errors and 5xx responses) are retried with
+    jittered exponential backoff. Rate limits are not retried, so the UI can
+    show its high-traffic message straight away.
+    """
+    response = await client.get("/users/self/checkins", params=params)
+
+    # Handle rate limiting
+    if response.status_code == 429:
+        logger.warning("Foursquare API rate limit hit")
+        raise RateLimitError("Too many requests to Foursquare API")
+
+    if response.status_code >= 500:
+        logger.warning(f"Foursquare API server error: {response.status_code}")
+        raise ServerError(f"Foursquare API returned {response.status_code}")
+
+    if response.status_code != 200:
+        logger.error(f"Foursquare API error: {response.status_code}")
+        raise APIError(f"Foursquare API returned {response.status_code}")
+
+    data = orjson.loads(response.content)
+    return data.get("response", {}).get("checkins", {})
+
+
 async def fetch_all_checkins(token: str, year: int = 2025) -> list:
-    """Fetch all check-ins for a given year from Foursquare API."""
-    checkins = []
-    offset = 0
-    limit = 250  # Max allowed by Foursquare API
+    """
+    Fetch all check-ins for a given year from Foursquare API.
+
+    After the first page, the remaining pages are requested in concurrent
+    batches, stopping at the first short page. The reported count covers all
+    of the user's check-ins, not just this year's, so it only caps how far we
+    page; when it is missing, pages are fetched one at a time.
+    """
+    limit = CHECKINS_PAGE_LIMIT
 
     # Date range for the year
-    start_timestamp = int(datetime(year, 1, 1).timestamp())
-    end_timestamp = int(datetime(year, 12, 31, 23, 59, 59).timestamp())
-
-    async with httpx.AsyncClient() as client:
-        while True:
-            response = await client.get(
-                f"{FOURSQUARE_API_BASE}/users/self/checkins",
-                params={
-                    "oauth_token": token,
-                    "v": "20231201",  # API version
-                    "limit": limit,
-                    "offset": offset,
-                    "afterTimestamp": start_timestamp,
-                    "beforeTimestamp": end_timestamp,
-                    "sort": "newestfirst"
-                }
+    start_timestamp, end_timestamp = year_bounds(year)
+
+    params = {
+        "oauth_token": token,
+        "v": "20231201",  # API version
+        "limit": limit,
+        "offset": 0,
+        "afterTimestamp": start_timestamp,
+        "beforeTimestamp": end_timestamp,
+        "sort": "newestfirst"
+    }
+
+    client = app.state.fsq_client
+    first_page = await fetch_checkins_page(client, params)
+    checkins = first_page.get("items", [])
+
+    # A short first page means there is nothing more to fetch
+    if len(checkins) < limit:
+        return checkins
+
+    total_count = first_page.get("count")
+    max_offset = CHECKINS_MAX_OFFSET + limit
+    if total_count:
+        max_offset = min(total_count, max_offset)
+    batch_size = CHECKINS_FETCH_CONCURRENCY if total_count else 1
+
+    offset = limit
+    while offset < max_offset:
+        offsets = range(offset, min(offset + batch_size * limit, max_offset), limit)
+        pages = await asyncio.gather(
+            *(fetch_checkins_page(client, {**params, "offset": page_offset}) for page_offset in offsets),
+            return_exceptions=True
+        )
+
+        for page in pages:
+            if isinstance(page, Exception):
+                raise page
+            items = page.get("items", [])
+            checkins.extend(items)
+
+            # A short page is the end of the year's check-ins
+            if len(items) < limit:
+                return checkins
+
+        offset += len(offsets) * limit
+
+    return checkins
+
+
+def remember_user_id(request: Request, user_profile: dict):
+    """Keep the Foursquare user id in the session so later requests can batch cache reads."""
+    user_id = user_profile.get("id")
+    if user_id and request.session.get("user_id") != user_id:
+        request.session["user_id"] = user_id
+
+
+def token_hash(token: str) -> str:
+    """Hash an access token so it never appears in cache keys."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def report_etag(request: Request, token: str) -> str:
+    """
+    Build the ETag for a report page or API response.
+
+    It covers the user, path, query (filters) and STATS_VERSION, and rotates
+    every STATS_CACHE_TTL so a revalidating browser eventually sees new check-ins.
+    """
+    window = int(time.time() // STATS_CACHE_TTL)
+    raw = f"{token_hash(token)}|{request.url.path}|{request.url.query}|{STATS_VERSION}|{window}"
+    return f'"{hashlib.sha256(raw.encode()).hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header includes the ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def stats_cache_key(user_id: str, year: int, exclude_sensitive: bool = False, exclude_filters: list = None) -> str:
+    """Build the cache key for a user's report with the given filters."""
+    filters = ",".join(sorted(exclude_filters)) if exclude_filters else str(int(exclude_sensitive))
+    return f"wrapped:{user_id}:{year}:{filters}"
+
+
+def profile_cache_key(token: str) -> str:
+    """Build the cache key for a token's Foursquare profile."""
+    return f"fsq:profile:{token_hash(token)}"
+
+
+async def cache_get(key: str):
+    """Return the cached JSON value for a key, or None on a miss or cache error."""
+    redis = app.state.redis
+    if redis is None:
+        return None
+
+    try:
+        cached = await redis.get(key)
+    except RedisError as e:
+        logger.warning(f"Cache read failed: {e}")
+        return None
+
+    return orjson.loads(cached) if cached else None
+
+
+async def cache_get_many(*keys: str) -> list:
+    """Return cached JSON values for several keys in one MGET (None for each miss)."""
+    redis = app.state.redis
+    if redis is None:
+        return [None] * len(keys)
+
+    try:
+        values = await redis.mget(keys)
+    except RedisError as e:
+        logger.warning(f"Cache read failed: {e}")
+        return [None] * len(keys)
+
+    return [orjson.loads(value) if value else None for value in values]
+
+
+async def cache_set(key: str, value, ttl: int):
+    """Store a JSON value in the cache, ignoring cache errors."""
+    redis = app.state.redis
+    if redis is None:
+        return
+
+    try:
+        await redis.set(key, orjson.dumps(value), ex=ttl)
+    except RedisError as e:
+        logger.warning(f"Cache write failed: {e}")
+
+
+async def invalidate_cached_profile(token: str):
+    """
+    Drop the cached profile for a token.
+
+    Cached reports are keyed by user id and may be shared with the user's
+    other sessions, so they are left to expire via STATS_CACHE_TTL.
+    """
+    redis = app.state.redis
+    if redis is None:
+        return
+
+    try:
+        await redis.delete(profile_cache_key(token))
+    except RedisError as e:
+        logger.warning(f"Cache invalidation failed: {e}")
+
+
+async def generate_stats(
+    token: str,
+    user_id: str = None,
+    year: int = 2025,
+    exclude_sensitive: bool = False,
+    exclude_filters: list = None
+) -> dict:
+    """
+    Fetch and analyze a user's check-ins for a year, using the report cache.
+
+    The cache is keyed by Foursquare user id so it survives token changes and
+    is shared across the user's sessions; without a user id it is skipped.
+    Returns an empty dict when there are no check-ins (which is not cached).
+    """
+    key = stats_cache_key(user_id, year, exclude_sensitive, exclude_filters) if user_id else None
+    if key:
+        stats = await cache_get(key)
+        if stats is not None:
+            return stats
+
+    # Single-flight: a double-fired request (or a pre-warm racing the loading
+    # page) awaits the build already in progress instead of starting another.
+    # Shielded so one caller disconnecting doesn't cancel it for the others.
+    flight_key = (token_hash(token), year, exclude_sensitive, tuple(sorted(exclude_filters or ())))
+    task = inflight_reports.get(flight_key)
+    if task is None:
+        task = asyncio.create_task(build_stats(token, key, year, exclude_sensitive, exclude_filters))
+        inflight_reports[flight_key] = task
+        task.add_done_callback(lambda _: inflight_reports.pop(flight_key, None))
+    return await asyncio.shield(task)
+
+
+async def build_stats(
+    token: str,
+    key: str = None,
+    year: int = 2025,
+    exclude_sensitive: bool = False,
+    exclude_filters: list = None
+) -> dict:
+    """Fetch and analyze check-ins, storing a non-empty result under the cache key if given."""
+    checkins = await fetch_all_checkins(token, year=year)
+
+    # Analysis is pure-Python CPU work; run it in the process pool so it
+    # doesn't block other requests on this worker. Check-ins are sent as JSON,
+    # which is much cheaper for this process to encode than pickling the list.
+    checkins_json = orjson.dumps(checkins)
+
+    # Use new granular filters if any are set, otherwise fall back to legacy
+    if exclude_filters:
+        analyze = partial(analyze_checkins_json, checkins_json, exclude_filters=exclude_filters)
+    else:
+        analyze = partial(analyze_checkins_json, checkins_json, exclude_sensitive=exclude_sensitive)
+
+    loop = asyncio.get_running_loop()
+    pool = app.state.analyze_pool
+    try:
+        stats = await loop.run_in_executor(pool, analyze)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed), which leaves the pool unusable for
+        # good; swap in a new one (unless a concurrent request already has) and retry once
+        if app.state.analyze_pool is pool:
+            logger.warning("Analysis worker pool broke; starting a new one")
+            app.state.analyze_pool = new_analyze_pool()
+            pool.shutdown(wait=False, cancel_futures=True)
+        stats = await loop.run_in_executor(app.state.analyze_pool, analyze)
+
+    if key and stats:
+        await cache_set(key, stats, STATS_CACHE_TTL)
+
+    return stats
+
+
+async def load_report(
+    request: Request,
+    token: str,
+    year: int = 2025,
+    exclude_sensitive: bool = False,
+    exclude_filters: list = None
+) -> tuple:
+    """
+    Return (user_profile, stats) for the signed-in user, using the caches.
+
+    Once the session knows the user id, the cached profile and report are read
+    together in one round trip. A cached report is only trusted if this
+    token's own profile confirms that user id, so a stale session can't be
+    served someone else's report.
+    """
+    user_profile = stats = None
+    user_id = request.session.get("user_id")
+    if user_id:
+        user_profile, stats = await cache_get_many(
+            profile_cache_key(token),
+            stats_cache_key(user_id, year, exclude_sensitive, exclude_filters)
+        )
+        if not user_profile or user_profile.get("id") != user_id:
+            stats = None
+    else:
+        user_profile = await cache_get(profile_cache_key(token))
+
+    if stats is None:
+        if user_profile:
+            stats = await generate_stats(
+                token,
+                user_profile.get("id"),
+                year=year,
+                exclude_sensitive=exclude_sensitive,
+                exclude_filters=exclude_filters
+            )
+        else:
+            user_profile, stats = await fetch_profile_and_stats(
+                token,
+                year=year,
+                exclude_sensitive=exclude_sensitive,
+                exclude_filters=exclude_filters
             )
 
-            # Handle rate limiting
-            if response.status_code == 429:
-                logger.warning("Foursquare API rate limit hit")
-                raise RateLimitError("Too many requests to Foursquare API")
+    remember_user_id(request, user_profile)
+    return user_profile, stats
 
-            if response.status_code != 200:
-                logger.error(f"Foursquare API error: {response.status_code}")
-                raise APIError(f"Foursquare API returned {response.status_code}")
 
-            data = response.json()
-            items = data.get("response", {}).get("checkins", {}).get("items", [])
+async def fetch_profile_and_stats(
+    token: str,
+    year: int = 2025,
+    exclude_sensitive: bool = False,
+    exclude_filters: list = None
+) -> tuple:
+    """
+    Fetch the profile and build the report concurrently, returning (user_profile, stats).
+
+    The profile's user id is only needed to cache the report, so check-ins
+    don't wait for it. The profile is optional: if it can't be fetched it is
+    treated as empty and the report is simply not cached.
+    """
+    user_profile, stats = await asyncio.gather(
+        fetch_user_profile(token),
+        generate_stats(token, year=year, exclude_sensitive=exclude_sensitive, exclude_filters=exclude_filters),
+        return_exceptions=True
+    )
 
-            if not items:
-                break
+    # Check-in errors go to the caller's handlers; the profile is optional
+    if isinstance(stats, BaseException):
+        raise stats
+    if isinstance(user_profile, BaseException):
+        logger.warning(f"Could not fetch user profile: {user_profile}")
+        user_profile = {}
 
-            checkins.extend(items)
-            offset += limit
+    user_id = user_profile.get("id")
+    if user_id and stats:
+        await cache_set(stats_cache_key(user_id, year, exclude_sensitive, exclude_filters), stats, STATS_CACHE_TTL)
 
-            # Safety limit
-            if offset > 5000:
-                break
+    return user_profile, stats
 
-    return checkins
+
+async def prewarm_report(token: str):
+    """Generate and cache the default report in the background, logging any failure."""
+    try:
+        async with prewarm_semaphore:
+            user_profile = await fetch_user_profile(token)
+            await generate_stats(token, user_profile.get("id"), year=2025)
+    except Exception as e:
+        logger.warning(f"Report pre-warm failed: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+"""
+Swarm Wrapped - Sessions Module
+
+Server-side sessions stored in Redis. The browser only holds a random session id cookie.
+"""
+
+import logging
+import secrets
+
+import orjson
+from redis.exceptions import RedisError
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+def regenerate_session(connection: HTTPConnection) -> None:
+    """
+    Move the session to a fresh id when the response is sent (call on login).
+
+    The old `sess:{id}` key is dropped, so a session id planted or seen before
+    login can't be used to reach the signed-in session. A no-op with
+    signed-cookie sessions, which carry no server-side id.
+    """
+    connection.scope["session_regenerate"] = True
+
+
+class RedisSessionMiddleware:
+    """
+    Drop-in replacement for Starlette's SessionMiddleware backed by Redis.
+
+    Session data lives under `sess:{session_id}` with a sliding TTL, and
+    `request.session` behaves exactly as it does with signed-cookie sessions.
+    The Redis client is read from `app.state.redis`, which the app lifespan sets up.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        session_cookie: str = "session_id",
+        max_age: int = 14 * 24 * 60 * 60,  # 14 days, in seconds
+        path: str = "/",
+        same_site: str = "lax",
+        https_only: bool = False
+    ) -> None:
+        self.app = app
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        redis = scope["app"].state.redis
+        connection = HTTPConnection(scope)
+        session_id = connection.cookies.get(self.session_cookie)
+        initial_data = None
+
+        if session_id:
+            try:
+                initial_data = await redis.get(f"sess:{session_id}")
+            except RedisError as e:
+                logger.warning(f"Session read failed: {e}")
+
+        if initial_data:
+            scope["session"] = orjson.loads(initial_data)
+        else:
+            # Unknown or expired id: start a fresh session under a new id
+            scope["session"] = {}
+            session_id = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal session_id, initial_data
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+
+                if scope.get("session_regenerate") and session_id:
+                    try:
+                        await redis.delete(f"sess:{session_id}")
+                    except RedisError as e:
+                        logger.warning(f"Session delete failed: {e}")
+                    session_id = initial_data = None
+
+                if scope["session"]:
+                    # Persist the session, refreshing its TTL and cookie expiry
+                    session_id = session_id or secrets.token_urlsafe(32)
+                    data = orjson.dumps(scope["session"])
+                    try:
+                        if data == initial_data:
+                            await redis.expire(f"sess:{session_id}", self.max_age)
+                        else:
+                            await redis.set(f"sess:{session_id}", data, ex=self.max_age)
+                    except RedisError as e:
+                        logger.warning(f"Session write failed: {e}")
+
+                    headers.append(
+                        "Set-Cookie",
+                        f"{self.session_cookie}={session_id}; path={self.path}; "
+                        f"Max-Age={self.max_age}; {self.security_flags}"
+                    )
+                elif initial_data:
+                    # The session has been cleared
+                    try:
+                        await redis.delete(f"sess:{session_id}")
+                    except RedisError as e:
+                        logger.warning(f"Session delete failed: {e}")
+
+                    headers.append(
+                        "Set-Cookie",
+                        f"{self.session_cookie}=null; path={self.path}; "
+                        f"expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.security_flags}"
+                    )
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
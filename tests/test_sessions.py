@@ -0,0 +1,70 @@
+"""
+Tests for the Redis-backed session middleware.
+"""
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from sessions import RedisSessionMiddleware, regenerate_session
+
+
+class FakeRedis:
+    """Just enough of redis.asyncio.Redis for the middleware, kept in a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+
+async def visit(request: Request):
+    request.session["visited"] = True
+    return PlainTextResponse("ok")
+
+
+async def login(request: Request):
+    regenerate_session(request)
+    request.session["access_token"] = "VICTIM_TOKEN"
+    return PlainTextResponse("ok")
+
+
+def make_client():
+    app = Starlette(routes=[Route("/visit", visit), Route("/login", login)])
+    app.add_middleware(RedisSessionMiddleware)
+    app.state.redis = FakeRedis()
+    return TestClient(app), app.state.redis
+
+
+def test_login_moves_session_to_new_id():
+    client, redis = make_client()
+    client.get("/visit")
+    planted_id = client.cookies["session_id"]
+
+    # A second browser carrying the planted id signs in
+    victim = TestClient(client.app, cookies={"session_id": planted_id})
+    new_id = victim.get("/login").cookies["session_id"]
+
+    assert new_id != planted_id
+    assert f"sess:{planted_id}" not in redis.data
+    assert b"VICTIM_TOKEN" in redis.data[f"sess:{new_id}"]
+
+
+def test_session_id_is_kept_without_login():
+    client, _ = make_client()
+    client.get("/visit")
+    session_id = client.cookies["session_id"]
+    client.get("/visit")
+    assert client.cookies["session_id"] == session_id